@@ -18,32 +18,48 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
 import re
+import csv
 import sys
 from datetime import datetime
 import shutil
+import zlib
 from pathlib import Path
 from copy import copy 
+from functools import lru_cache
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+from pandas.api.types import union_categoricals
+
+# Expressões regulares compiladas uma única vez (usadas a cada linha do extrato)
+RE_ESPACOS = re.compile(r'\s+')
+# Formato Sicoob: opcionalmente "- " seguido de número com vírgula e " D" ou " C"
+RE_VALOR_SICOOB = re.compile(r'^-?\s*(\d{1,3}(?:\.\d{3})*,\d{2})\s*([DC])$')
+RE_NAO_NUMERICO = re.compile(r'[^\d.,-]')
+
+# Padrões de saldo usados em Series.str.contains (texto, em minúsculas; cada
+# chamada diz como trata maiúsculas/minúsculas)
+# Linhas de saldo descartadas na consolidação do extrato Sicoob
+PADRAO_SALDO = r'saldo (?:do dia|anterior|atual|final)'
+# Frases de saldo filtradas das transações já consolidadas (inclui as de PADRAO_SALDO)
+PADRAO_SALDO_IGNORAR = r'saldo (?:do dia|anterior|atual|final|bloqueado|disponível|em conta)'
 
 def verificar_dependencias():
-    """Verifica se as bibliotecas necessárias estão instaladas"""
+    """Verifica se as bibliotecas necessárias estão instaladas (sem importá-las)"""
     bibliotecas_faltando = []
     
-    try:
-        import openpyxl
-    except ImportError:
+    if find_spec("openpyxl") is None:
         bibliotecas_faltando.append("openpyxl")
     
-    try:
-        import chardet
-    except ImportError:
+    if find_spec("chardet") is None:
         print("⚠️ Biblioteca 'chardet' não encontrada (opcional para detecção automática de encoding)")
     
     if bibliotecas_faltando:
-        print("⚠️ Bibliotecas em falta:")
-        for lib in bibliotecas_faltando:
-            print(f"   - {lib}")
-        print("\n💡 Para instalar as bibliotecas faltando, execute:")
-        print(f"pip install {' '.join(bibliotecas_faltando)}")
+        # mensagem montada inteira e escrita no console de uma vez
+        linhas = ["⚠️ Bibliotecas em falta:"]
+        linhas += [f"   - {lib}" for lib in bibliotecas_faltando]
+        linhas.append("\n💡 Para instalar as bibliotecas faltando, execute:")
+        linhas.append(f"pip install {' '.join(bibliotecas_faltando)}")
+        print("\n".join(linhas))
         return False
     return True
 
@@ -60,6 +76,14 @@ def obter_caminho_recurso(nome_arquivo):
     
     return os.path.join(base_path, nome_arquivo)
 
+# Caminho do template embutido, resolvido uma única vez ao carregar o módulo
+CAMINHO_TEMPLATE = obter_caminho_recurso('Automação_Gransoft.xlsx')
+
+@lru_cache(maxsize=None)
+def template_disponivel():
+    """Verifica (uma única vez por execução) se o template embutido existe"""
+    return os.path.exists(CAMINHO_TEMPLATE)
+
 def criar_planilha_usuario(nome_sugerido=None):
     """
     Cria uma nova planilha para o usuário baseada no template embutido
@@ -85,11 +109,9 @@ def criar_planilha_usuario(nome_sugerido=None):
         return None
 
     try:
-        caminho_template = obter_caminho_recurso('Automação_Gransoft.xlsx')
-        
-        if os.path.exists(caminho_template):
+        if template_disponivel():
             # Copia o template. Se a cópia for bem-sucedida, o arquivo está pronto.
-            shutil.copy2(caminho_template, caminho_destino)
+            shutil.copy2(CAMINHO_TEMPLATE, caminho_destino)
             print(f"✅ Nova planilha criada a partir do template: {os.path.basename(caminho_destino)}")
         else:
             # Se o template não existe, cria uma planilha básica do zero.
@@ -105,38 +127,20 @@ def criar_planilha_usuario(nome_sugerido=None):
 def criar_planilha_basica(caminho_destino):
     """
     Cria uma planilha básica caso o template não esteja disponível
+    (workbook em modo somente escrita, gravado em uma única passada)
     """
     try:
         from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
         
-        # Cria novo workbook
-        wb = Workbook()
+        # Cria novo workbook em modo write-only
+        wb = Workbook(write_only=True)
         
         # Aba Banco
-        ws_banco = wb.active
-        ws_banco.title = "Banco"
-        
-        # Cabeçalhos
-        cabecalhos = [
-            "Data Vencimento", "Descrição", "Valor", "Fornecedor", 
-            "Numero Docto", "Conta Contábil", "Observação (opcional)"
-        ]
-        
-        # Adiciona cabeçalhos com formatação
-        for col, header in enumerate(cabecalhos, 1):
-            cell = ws_banco.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = Border(
-                left=Side(style="thin"),
-                right=Side(style="thin"),
-                top=Side(style="thin"),
-                bottom=Side(style="thin")
-            )
+        ws_banco = wb.create_sheet("Banco")
         
-        # Ajusta largura das colunas
+        # Ajusta largura das colunas (antes de gravar qualquer linha)
         ws_banco.column_dimensions['A'].width = 15  # Data
         ws_banco.column_dimensions['B'].width = 50  # Descrição
         ws_banco.column_dimensions['C'].width = 15  # Valor
@@ -145,11 +149,36 @@ def criar_planilha_basica(caminho_destino):
         ws_banco.column_dimensions['F'].width = 20  # Conta Contábil
         ws_banco.column_dimensions['G'].width = 30  # Observação
         
-        # Cria aba Base de dados
+        # Cabeçalhos
+        cabecalhos = [
+            "Data Vencimento", "Descrição", "Valor", "Fornecedor", 
+            "Numero Docto", "Conta Contábil", "Observação (opcional)"
+        ]
+        
+        # Estilos criados uma única vez e compartilhados por todas as células do cabeçalho
+        fonte = Font(bold=True, color="FFFFFF")
+        preenchimento = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        alinhamento = Alignment(horizontal="center")
+        lado = Side(style="thin")
+        borda = Border(left=lado, right=lado, top=lado, bottom=lado)
+        
+        # Adiciona cabeçalhos com formatação
+        linha_cabecalho = []
+        for header in cabecalhos:
+            cell = WriteOnlyCell(ws_banco, value=header)
+            cell.font = fonte
+            cell.fill = preenchimento
+            cell.alignment = alinhamento
+            cell.border = borda
+            linha_cabecalho.append(cell)
+        ws_banco.append(linha_cabecalho)
+        
+        # Cria aba Base de dados (colunas A, C e E)
         ws_base = wb.create_sheet("Base de dados")
-        ws_base.cell(row=1, column=1, value="Nome")
-        ws_base.cell(row=1, column=3, value="Conta Contábil") 
-        ws_base.cell(row=1, column=5, value="Colaboradores, prestadores, funcionário E FORNECEDORES")
+        ws_base.append([
+            "Nome", None, "Conta Contábil", None,
+            "Colaboradores, prestadores, funcionário E FORNECEDORES"
+        ])
         
         # Salva a planilha
         wb.save(caminho_destino)
@@ -173,13 +202,17 @@ def processar_formato_valor_sicoob(valor_str):
     if not valor_str or valor_str == "nan":
         return None
     
+    # Créditos (qualquer 'C') são descartados antes de qualquer regex;
+    # um débito no formato Sicoob nunca contém 'C'
+    if 'C' in valor_str.upper():
+        return None
+    
     # Remove espaços extras
-    valor_str = re.sub(r'\s+', ' ', valor_str)
+    valor_str = RE_ESPACOS.sub(' ', valor_str)
     
-    # Padrão para formato Sicoob: opcionalmente "- " seguido de número com vírgula e " D" ou " C"
+    # Padrão para formato Sicoob (RE_VALOR_SICOOB)
     # Exemplos: "- 125,69 D", "2.794,76 C", "- 2.460,73 D"
-    padrao = r'^-?\s*(\d{1,3}(?:\.\d{3})*,\d{2})\s*([DC])$'
-    match = re.match(padrao, valor_str)
+    match = RE_VALOR_SICOOB.match(valor_str)
     
     if match:
         numero_str = match.group(1)  # Ex: "125,69" ou "2.460,73"
@@ -198,12 +231,8 @@ def processar_formato_valor_sicoob(valor_str):
     
     # Se não conseguiu processar no formato Sicoob, tenta formato genérico
     try:
-        # Verifica se tem indicador de crédito
-        if 'C' in valor_str.upper():
-            return None  # Ignora créditos
-        
         # Remove tudo que não é dígito, vírgula, ponto ou sinal de menos
-        valor_limpo = re.sub(r'[^\d.,-]', '', valor_str)
+        valor_limpo = RE_NAO_NUMERICO.sub('', valor_str)
         if valor_limpo:
             valor_limpo = valor_limpo.replace(',', '.')
             valor_numerico = float(valor_limpo)
@@ -215,6 +244,42 @@ def processar_formato_valor_sicoob(valor_str):
     
     return None
 
+def ler_aba_banco(caminho_planilha):
+    """
+    Lê da aba 'Banco' apenas as colunas usadas na checagem de duplicidade
+    (A: Data Vencimento, B: Descrição, C: Valor), em modo somente leitura,
+    sem carregar formatação nem as demais abas.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(caminho_planilha, read_only=True, data_only=True)
+    try:
+        linhas = wb['Banco'].iter_rows(min_row=2, max_col=3, values_only=True)
+        return pd.DataFrame(list(linhas), columns=['Data Vencimento', 'Descrição', 'Valor'])
+    finally:
+        wb.close()
+
+def iniciar_leitura_banco(caminho_planilha):
+    """
+    Dispara a leitura da aba 'Banco' numa thread separada, para que ela ocorra
+    enquanto o extrato é lido e consolidado. O DataFrame sai de .result().
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    leitura = executor.submit(ler_aba_banco, caminho_planilha)
+    executor.shutdown(wait=False)
+    return leitura
+
+def converter_datas_br(serie):
+    """
+    Converte datas no formato dd/mm/aaaa com formato fixo (caminho rápido);
+    só o que não casar com o formato volta para a inferência genérica.
+    """
+    datas = pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+    fora_do_formato = datas.isna() & serie.notna()
+    if fora_do_formato.any():
+        datas[fora_do_formato] = pd.to_datetime(serie[fora_do_formato], dayfirst=True, errors='coerce')
+    return datas
+
 def adicionar_dados_preservando_formatacao(caminho_planilha, novos_dados):
     """
     Adiciona novos dados à planilha preservando toda a formatação original.
@@ -233,95 +298,93 @@ def adicionar_dados_preservando_formatacao(caminho_planilha, novos_dados):
         wb = load_workbook(caminho_planilha)
         ws = wb['Banco']
         
-        # Encontra a primeira linha vazia (após os dados existentes)
-        linha_inicio = 1
-        while linha_inicio <= ws.max_row:
-            # Verifica se a linha está completamente vazia
-            linha_vazia = True
-            for col in range(1, 8):  # Colunas A até G
-                cell_value = ws.cell(row=linha_inicio, column=col).value
-                if cell_value is not None and str(cell_value).strip() != "":
-                    linha_vazia = False
-                    break
-            
-            if linha_vazia and linha_inicio > 1:  # Não conta a linha de cabeçalho
+        # Encontra a linha seguinte ao último dado existente, varrendo de baixo para cima
+        # a partir de ws.max_row (normalmente para na primeira linha verificada)
+        linha_inicio = 2  # Não conta a linha de cabeçalho
+        for linha in range(ws.max_row, 1, -1):
+            valores_linha = (ws.cell(row=linha, column=col).value for col in range(1, 8))  # Colunas A até G
+            if any(v is not None and str(v).strip() != "" for v in valores_linha):
+                linha_inicio = linha + 1
                 break
-            linha_inicio += 1
         
         print(f"📍 Iniciando inserção na linha {linha_inicio}")
         
         # Copia a formatação da linha de cabeçalho ou da última linha com dados
         linha_formato_referencia = 1 if linha_inicio <= 2 else linha_inicio - 1
         
-        # Adiciona os novos dados
-        for i, (index, row) in enumerate(novos_dados.iterrows()):
+        # Lê os estilos da linha de referência uma única vez (reaproveitados em todas as novas linhas)
+        estilos_referencia = []
+        for col in range(1, 8):
+            cell_origem = ws.cell(row=linha_formato_referencia, column=col)
+            # Copia apenas os atributos de estilo que não causam problemas
+            estilos_referencia.append((
+                copy(cell_origem.font),
+                copy(cell_origem.border),
+                copy(cell_origem.fill),
+                copy(cell_origem.alignment)
+            ))
+        
+        # Converte datas e valores na coluna inteira, antes do laço de escrita
+        colunas_banco = ['Data Vencimento', 'Descrição', 'Valor', 'Fornecedor',
+                         'Numero Docto', 'Conta Contábil', 'Observação (opcional)']
+        dados_escrita = novos_dados[colunas_banco].copy()
+        
+        # Data Vencimento: texto dd/mm/aaaa vira data; outros tipos (ex.: datas lidas
+        # do Excel) seguem como estão; texto fora do formato fica sem formatação de data
+        datas_originais = novos_dados['Data Vencimento']
+        data_em_texto = datas_originais.map(lambda v: isinstance(v, str)).astype(bool)
+        datas_convertidas = pd.to_datetime(datas_originais.where(data_em_texto), format='%d/%m/%Y', errors='coerce')
+        data_convertida = data_em_texto & datas_convertidas.notna()
+        dados_escrita['Data Vencimento'] = datas_convertidas.astype(object).where(data_convertida, datas_originais)
+        formatar_data = (~data_em_texto | data_convertida).tolist()
+        
+        # Valor: numérico recebe formatação de moeda brasileira; o resto segue como está
+        valores_numericos = pd.to_numeric(novos_dados['Valor'], errors='coerce')
+        valor_numerico = valores_numericos.notna()
+        dados_escrita['Valor'] = valores_numericos.astype(object).where(valor_numerico, novos_dados['Valor'])
+        formatar_valor = valor_numerico.tolist()
+        
+        # Estilos nomeados registrados uma única vez no workbook: cada célula nova recebe
+        # só o nome do estilo. O nome é só um CRC dos atributos: colunas com a mesma
+        # formatação dividem um único estilo, e se a formatação da linha de referência
+        # mudar, um novo estilo é criado em vez de reusar o antigo
+        def registrar_estilo(col, formato_numero):
+            fonte, borda, preenchimento, alinhamento = estilos_referencia[col - 1]
+            chave = zlib.crc32(repr((fonte, borda, preenchimento, alinhamento, formato_numero)).encode())
+            nome = f"Sicoob {chave:08x}"
+            if nome not in wb.named_styles:
+                wb.add_named_style(NamedStyle(
+                    name=nome, font=fonte, border=borda, fill=preenchimento,
+                    alignment=alinhamento, number_format=formato_numero
+                ))
+            return nome
+        
+        estilos_linha = [registrar_estilo(col, 'General') for col in range(1, 8)]
+        estilo_data = registrar_estilo(1, 'DD/MM/YYYY') if any(formatar_data) else None
+        estilo_valor = registrar_estilo(3, 'R$ #,##0.00') if any(formatar_valor) else None
+        
+        # Largura necessária por coluna, medida só no cabeçalho e nas linhas novas
+        larguras = [len(str(ws.cell(row=1, column=col).value or '')) for col in range(1, 8)]
+        
+        # Adiciona os novos dados (colunas A até G), linha a linha a partir de linha_inicio
+        for i, valores_linha in enumerate(dados_escrita.itertuples(index=False, name=None)):
             linha_atual = linha_inicio + i
             
-            # Data Vencimento (Coluna A)
-            cell_data = ws.cell(row=linha_atual, column=1)
-            try:
-                # Converte string para data se necessário
-                if isinstance(row['Data Vencimento'], str):
-                    data_obj = datetime.strptime(row['Data Vencimento'], '%d/%m/%Y')
-                    cell_data.value = data_obj
-                else:
-                    cell_data.value = row['Data Vencimento']
-                # Aplica formatação de data
-                cell_data.number_format = 'DD/MM/YYYY'
-            except:
-                cell_data.value = row['Data Vencimento']
-            
-            # Descrição (Coluna B)
-            ws.cell(row=linha_atual, column=2, value=row['Descrição'])
-            
-            # Valor (Coluna C) - com formatação de moeda brasileira
-            cell_valor = ws.cell(row=linha_atual, column=3)
-            try:
-                cell_valor.value = float(row['Valor'])
-                cell_valor.number_format = 'R$ #,##0.00'
-            except:
-                cell_valor.value = row['Valor']
-            
-            # Fornecedor (Coluna D)
-            ws.cell(row=linha_atual, column=4, value=row['Fornecedor'])
-            
-            # Numero Docto (Coluna E)
-            ws.cell(row=linha_atual, column=5, value=row['Numero Docto'])
+            for col, valor in enumerate(valores_linha, 1):
+                # formatação da linha de referência (borda, alinhamento, etc.) pelo estilo nomeado
+                ws.cell(row=linha_atual, column=col, value=valor).style = estilos_linha[col - 1]
+                if valor is not None:
+                    larguras[col - 1] = max(larguras[col - 1], len(str(valor)))
             
-            # Conta Contábil (Coluna F)
-            ws.cell(row=linha_atual, column=6, value=row['Conta Contábil'])
-            
-            # Observação (Coluna G)
-            ws.cell(row=linha_atual, column=7, value=row['Observação (opcional)'])
-            
-            # Copia formatação da linha de referência (borda, alinhamento, etc.)
-            if linha_formato_referencia > 0:
-                for col in range(1, 8):
-                    cell_origem = ws.cell(row=linha_formato_referencia, column=col)
-                    cell_destino = ws.cell(row=linha_atual, column=col)
-                    
-                    # Copia apenas os atributos de estilo que não causam problemas
-                    cell_destino.font = copy(cell_origem.font)
-                    cell_destino.border = copy(cell_origem.border)
-                    cell_destino.fill = copy(cell_origem.fill)
-                    cell_destino.alignment = copy(cell_origem.alignment)
-
-# ... (restante do código)
+            if formatar_data[i]:
+                ws.cell(row=linha_atual, column=1).style = estilo_data
+            if formatar_valor[i]:
+                ws.cell(row=linha_atual, column=3).style = estilo_valor
         
-        # Ajusta largura das colunas se necessário
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)  # Máximo de 50
-            ws.column_dimensions[column_letter].width = adjusted_width
+        # Ajusta largura das colunas se necessário (só aumenta; máximo de 50)
+        for col, largura in enumerate(larguras, 1):
+            dimensao = ws.column_dimensions[get_column_letter(col)]
+            dimensao.width = max(dimensao.width or 0, min(largura + 2, 50))
         
         # Salva a planilha com tratamento de erro
         try:
@@ -350,6 +413,62 @@ def adicionar_dados_preservando_formatacao(caminho_planilha, novos_dados):
         print(f"❌ Erro ao preservar formatação: {e}")
         return False
 
+def estrategia_csv_provavel(caminho_arquivo):
+    """
+    Escolhe a leitura mais provável do CSV olhando só o início do arquivo:
+    encoding pelo BOM ou, sem BOM, UTF-8 se houver acentos válidos em UTF-8 e
+    windows-1252 nos demais casos (padrão das exportações do Sicoob);
+    separador pelo csv.Sniffer (',' se não for possível detectar).
+    """
+    with open(caminho_arquivo, 'rb') as f:
+        inicio = f.read(4096)
+
+    if inicio.startswith(b'\xef\xbb\xbf'):
+        encoding = 'utf-8-sig'
+    elif inicio[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        encoding = 'utf-16'
+    elif inicio.isascii():
+        encoding = 'windows-1252'
+    else:
+        try:
+            inicio.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError as erro:
+            # bloco cortado no meio de um caractere multibyte ainda conta como UTF-8
+            encoding = 'utf-8' if erro.start >= len(inicio) - 3 else 'windows-1252'
+
+    try:
+        amostra = inicio.decode(encoding, errors='ignore')
+        separador = csv.Sniffer().sniff(amostra, delimiters=',;\t').delimiter
+    except csv.Error:
+        separador = ','
+
+    return {'sep': separador, 'quotechar': '"', 'encoding': encoding}
+
+# Encodings já detectados, por (caminho, data de modificação, tamanho)
+ENCODINGS_DETECTADOS = {}
+
+def detectar_encoding(caminho_arquivo):
+    """
+    Detecta o encoding do arquivo com o UniversalDetector do chardet, lendo em
+    blocos de 8 KB e parando assim que a detecção for conclusiva.
+    O resultado fica guardado enquanto o arquivo não mudar.
+    """
+    info = os.stat(caminho_arquivo)
+    chave = (caminho_arquivo, info.st_mtime, info.st_size)
+    if chave not in ENCODINGS_DETECTADOS:
+        from chardet.universaldetector import UniversalDetector
+
+        detector = UniversalDetector()
+        with open(caminho_arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(8192), b''):
+                detector.feed(bloco)
+                if detector.done:
+                    break
+        detector.close()
+        ENCODINGS_DETECTADOS[chave] = detector.result['encoding'] or 'windows-1252'
+    return ENCODINGS_DETECTADOS[chave]
+
 def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, mostrar_detalhes=True):
     """
     Processa um único extrato e adiciona apenas na aba 'Banco' da planilha.
@@ -359,6 +478,9 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
         if mostrar_detalhes:
             print(f"🔄 Processando: {os.path.basename(caminho_extrato)}")
 
+        # a aba 'Banco' (usada só na checagem de duplicidade) é lida em paralelo
+        leitura_banco = iniciar_leitura_banco(caminho_planilha_usuario)
+
         # --- 1. LEITURA ROBUSTA DO EXTRATO ---
         df_extrato = None
         try:
@@ -374,7 +496,10 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
 
         if df_extrato is None:
             csv_lido = False
-            estrategias_csv = [
+            # a estratégia provável (BOM + separador detectado) vem primeiro;
+            # as demais só são tentadas se ela falhar
+            estrategia_provavel = estrategia_csv_provavel(caminho_extrato)
+            estrategias_csv = [estrategia_provavel] + [e for e in [
                 {'sep': ',', 'quotechar': '"', 'encoding': 'windows-1252'},
                 {'sep': ',', 'quotechar': '"', 'encoding': 'cp1252'},
                 {'sep': ',', 'quotechar': '"', 'encoding': 'iso-8859-1'},
@@ -382,17 +507,14 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
                 {'sep': ',', 'quotechar': '"', 'encoding': 'utf-8-sig'},
                 {'sep': ',', 'quotechar': '"', 'encoding': None},
                 {'sep': ',', 'quotechar': '"', 'encoding': 'utf-8'},
-            ]
+            ] if e != estrategia_provavel]
             for i, estrategia in enumerate(estrategias_csv):
                 try:
                     if mostrar_detalhes:
                         print(f"🔄 Tentando CSV {i+1} (encoding: {estrategia.get('encoding', 'auto')})...")
                     if estrategia['encoding'] is None:
                         try:
-                            import chardet
-                            with open(caminho_extrato, 'rb') as f:
-                                detected_encoding = chardet.detect(f.read())['encoding']
-                                estrategia['encoding'] = detected_encoding or 'windows-1252'
+                            estrategia['encoding'] = detectar_encoding(caminho_extrato)
                             if mostrar_detalhes:
                                 print(f"🔍 Encoding detectado: {estrategia['encoding']}")
                         except Exception:
@@ -403,7 +525,7 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
                         skiprows=1,
                         header=None,
                         on_bad_lines='skip',
-                        engine='python',
+                        engine='c',
                         **estrategia
                     )
                     if not df_tmp.empty and df_tmp.shape[1] >= 3:
@@ -421,19 +543,6 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
                     "Verifique se é um extrato válido do Sicoob."
                 )
 
-        # --- 1.1 Ler a aba 'Banco' para checar duplicidade (se existir) ---
-        colunas_banco = ['Data Vencimento','Descrição','Valor','Fornecedor','Numero Docto','Conta Contábil','Observação (opcional)']
-        try:
-            df_banco = pd.read_excel(caminho_planilha_usuario, sheet_name='Banco', engine='openpyxl')
-            # se vier sem as colunas esperadas, tentamos alinhar
-            for c in colunas_banco:
-                if c not in df_banco.columns:
-                    df_banco[c] = None
-            df_banco = df_banco[colunas_banco]
-        except Exception:
-            # se a aba não existir ou der erro, consideramos vazia
-            df_banco = pd.DataFrame(columns=colunas_banco)
-
         # --- 2. PREPARO DOS DADOS DO EXTRATO ---
         colunas_necessarias = ['DATA', 'DOCUMENTO', 'HISTORICO', 'VALOR']
         if df_extrato.shape[1] >= 4:
@@ -456,49 +565,35 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
             raise Exception("Sem dados válidos após limpeza.")
 
         # --- 3. CONSOLIDAÇÃO DE DESCRIÇÕES (ignora créditos/saldos) ---
-        registros_consolidados = []
-        historico_atual = ""
-        linha_principal = None
-        transacoes_processadas = 0
-        ignorando_continuacoes_credito = False
-
-        for _, row in df_extrato.iterrows():
-            data_str = str(row['DATA']).strip() if pd.notna(row['DATA']) else ""
-            hist_str = str(row['HISTORICO']).strip() if pd.notna(row['HISTORICO']) else ""
-            valor_str = str(row['VALOR']).strip() if pd.notna(row['VALOR']) else ""
-
-            if data_str and data_str != "nan":
-                ignorando_continuacoes_credito = False
-                eh_credito = bool(valor_str) and ('C' in valor_str.upper())
-                frases_saldo = ['SALDO DO DIA','SALDO ANTERIOR','SALDO ATUAL','SALDO FINAL']
-                eh_saldo = any(f.lower() in hist_str.lower() for f in frases_saldo)
-
-                if eh_credito or eh_saldo:
-                    ignorando_continuacoes_credito = True
-                    continue
-
-                if linha_principal is not None:
-                    linha_principal['HISTORICO'] = historico_atual.strip()
-                    registros_consolidados.append(linha_principal.copy())
-                    transacoes_processadas += 1
-
-                linha_principal = row.copy()
-                historico_atual = hist_str
-
-            elif hist_str:
-                if ignorando_continuacoes_credito:
-                    continue
-                if linha_principal is not None:
-                    frases_saldo = ['SALDO DO DIA','SALDO ANTERIOR','SALDO ATUAL','SALDO FINAL']
-                    if not any(f.lower() in hist_str.lower() for f in frases_saldo):
-                        historico_atual = (historico_atual + " " + hist_str).strip() if historico_atual else hist_str
-
-        if linha_principal is not None:
-            linha_principal['HISTORICO'] = historico_atual.strip()
-            registros_consolidados.append(linha_principal.copy())
-            transacoes_processadas += 1
-
-        df_extrato_consolidado = pd.DataFrame(registros_consolidados)
+        # Cada linha com data abre uma transação; as linhas seguintes sem data
+        # são continuações do histórico. O número da transação é a soma
+        # acumulada das linhas com data, e o histórico é unido por groupby.
+        datas = df_extrato['DATA'].astype(str).str.strip().where(df_extrato['DATA'].notna(), '')
+        historicos = df_extrato['HISTORICO'].astype(str).str.strip().where(df_extrato['HISTORICO'].notna(), '')
+        valores = df_extrato['VALOR'].astype(str).str.strip().where(df_extrato['VALOR'].notna(), '')
+
+        tem_data = datas.ne('') & datas.ne('nan')
+        id_transacao = tem_data.cumsum()
+
+        # o histórico vem como está no extrato ("SALDO DO DIA", "Saldo do dia"): case=False
+        eh_saldo = historicos.str.contains(PADRAO_SALDO, case=False)
+        eh_credito = valores.str.upper().str.contains('C', regex=False)
+
+        # transações de crédito/saldo são descartadas junto com suas continuações;
+        # continuações antes da primeira data (transação 0) também
+        ids_ignorados = id_transacao[tem_data & (eh_credito | eh_saldo)]
+        na_transacao_valida = id_transacao.gt(0) & ~id_transacao.isin(ids_ignorados)
+
+        cabecalhos = tem_data & na_transacao_valida
+        partes_historico = na_transacao_valida & historicos.ne('') & (tem_data | ~eh_saldo)
+        historico_por_transacao = historicos[partes_historico].groupby(id_transacao[partes_historico]).agg(' '.join)
+
+        df_extrato_consolidado = df_extrato.loc[cabecalhos, ['DATA', 'DOCUMENTO', 'VALOR']]
+        df_extrato_consolidado.insert(
+            2, 'HISTORICO', id_transacao[cabecalhos].map(historico_por_transacao).fillna('')
+        )
+        transacoes_processadas = len(df_extrato_consolidado)
+
         if df_extrato_consolidado.empty:
             if mostrar_detalhes:
                 print("⚠️ Nenhuma transação de débito após consolidação")
@@ -506,26 +601,36 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
                     'novos_lancamentos': 0, 'duplicatas_ignoradas': 0}
 
         # --- 4. FILTROS ADICIONAIS ---
-        frases_ignorar = [
-            'SALDO DO DIA','SALDO ANTERIOR','SALDO ATUAL','SALDO FINAL',
-            'Saldo bloqueado anterior','Saldo bloqueado','Saldo disponível','Saldo em conta'
+        # normaliza os espaços e gera o histórico em minúsculas uma única vez
+        # (usado no filtro abaixo e na chave de duplicidade)
+        # (split sem argumentos já descarta as pontas e agrupa os espaços repetidos)
+        df_extrato_consolidado['HISTORICO'] = df_extrato_consolidado['HISTORICO'].str.split().str.join(' ')
+        df_extrato_consolidado['HISTORICO_MINUSCULO'] = df_extrato_consolidado['HISTORICO'].str.lower()
+        # a consolidação só descarta linhas isoladas com PADRAO_SALDO; aqui uma única
+        # passada pega as demais frases e as que surgem ao juntar as continuações
+        # (coluna já em minúsculas, então o padrão em minúsculas basta, sem case=False)
+        df_extrato_consolidado = df_extrato_consolidado[
+            ~df_extrato_consolidado['HISTORICO_MINUSCULO'].str.contains(PADRAO_SALDO_IGNORAR, na=False)
         ]
-        for f in frases_ignorar:
-            df_extrato_consolidado = df_extrato_consolidado[
-                ~df_extrato_consolidado['HISTORICO'].str.contains(f, case=False, na=False)
-            ]
 
         # --- 5. PROCESSAMENTO DOS VALORES ---
-        df_extrato_consolidado = df_extrato_consolidado.dropna(subset=['DATA'])
-        df_extrato_consolidado['HISTORICO'] = (
-            df_extrato_consolidado['HISTORICO'].str.replace(r'\s+', ' ', regex=True).str.strip()
-        )
-        df_extrato_consolidado['VALOR_PROCESSADO'] = [
-            processar_formato_valor_sicoob(v) for v in df_extrato_consolidado['VALOR']
-        ]
-
-        # --- 6. APENAS DÉBITOS VÁLIDOS ---
-        df_extrato_debitos = df_extrato_consolidado[df_extrato_consolidado['VALOR_PROCESSADO'].notna()].copy()
+        # formato Sicoob tratado de forma vetorizada: número + indicador D/C
+        valores = df_extrato_consolidado['VALOR'].astype(str).str.replace(RE_ESPACOS, ' ', regex=True).str.strip()
+        partes_valor = valores.str.extract(RE_VALOR_SICOOB)
+        valor_processado = pd.to_numeric(
+            partes_valor[0].str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+            errors='coerce'
+        ).where(partes_valor[1] == 'D')
+        # valores fora do padrão Sicoob seguem pelo parser genérico, linha a linha
+        fora_do_padrao = partes_valor[1].isna()
+        if fora_do_padrao.any():
+            valor_processado.loc[fora_do_padrao] = np.array([
+                processar_formato_valor_sicoob(v) for v in df_extrato_consolidado.loc[fora_do_padrao, 'VALOR']
+            ], dtype=float)
+        df_extrato_consolidado['VALOR_PROCESSADO'] = valor_processado
+
+        # --- 6. APENAS DÉBITOS VÁLIDOS (com data e valor) ---
+        df_extrato_debitos = df_extrato_consolidado.dropna(subset=['DATA', 'VALOR_PROCESSADO'])
         if df_extrato_debitos.empty:
             if mostrar_detalhes:
                 print("⚠️ Nenhuma transação de débito válida encontrada.")
@@ -533,39 +638,61 @@ def processar_extrato_individual(caminho_extrato, caminho_planilha_usuario, most
                     'debitos_encontrados': 0, 'novos_lancamentos': 0, 'duplicatas_ignoradas': 0}
 
         # --- 7. MAPEAMENTO PARA A ESTRUTURA DA PLANILHA ---
+        # índice sequencial + arrays NumPy: o DataFrame é montado sem alinhar índices
+        df_extrato_debitos = df_extrato_debitos.reset_index(drop=True)
+        historicos = df_extrato_debitos['HISTORICO'].to_numpy()
         novos_lancamentos = pd.DataFrame({
-            'Data Vencimento': df_extrato_debitos['DATA'],
-            'Descrição': df_extrato_debitos['HISTORICO'],
-            'Valor': df_extrato_debitos['VALOR_PROCESSADO'],
+            'Data Vencimento': df_extrato_debitos['DATA'].to_numpy(),
+            'Descrição': historicos,
+            'Valor': df_extrato_debitos['VALOR_PROCESSADO'].to_numpy(),
             'Fornecedor': '',
-            'Numero Docto': df_extrato_debitos['DOCUMENTO'],
+            'Numero Docto': df_extrato_debitos['DOCUMENTO'].to_numpy(),
             'Conta Contábil': '',
-            'Observação (opcional)': df_extrato_debitos['HISTORICO']
+            'Observação (opcional)': historicos
         })
+        # datas convertidas uma única vez (a planilha continua recebendo o texto original)
+        datas_novos_lancamentos = converter_datas_br(novos_lancamentos['Data Vencimento'])
 
         # --- 8. PREVENÇÃO DE DUPLICIDADE (comparando com o que já está em Banco) ---
-        col_cmp = ['Data Vencimento','Descrição','Valor']
-        df_banco_temp = df_banco.dropna(subset=col_cmp).copy()
-        novos_temp = novos_lancamentos.dropna(subset=col_cmp).copy()
-
+        # aguarda a leitura da aba 'Banco' disparada no início
         try:
-            df_banco_temp['Data Vencimento'] = pd.to_datetime(df_banco_temp['Data Vencimento'], dayfirst=True, errors='coerce').dt.strftime('%d/%m/%Y')
-            novos_temp['Data Vencimento'] = pd.to_datetime(novos_temp['Data Vencimento'], dayfirst=True, errors='coerce').dt.strftime('%d/%m/%Y')
+            df_banco = leitura_banco.result()
         except Exception:
-            pass
-
-        df_banco_temp['ID'] = (
-            df_banco_temp['Data Vencimento'].astype(str).str.strip() + '|' +
-            df_banco_temp['Descrição'].astype(str).str.strip().str.lower() + '|' +
-            df_banco_temp['Valor'].astype(str)
-        )
-        novos_temp['ID'] = (
-            novos_temp['Data Vencimento'].astype(str).str.strip() + '|' +
-            novos_temp['Descrição'].astype(str).str.strip().str.lower() + '|' +
-            novos_temp['Valor'].astype(str)
-        )
+            # se a aba não existir ou der erro, consideramos vazia
+            df_banco = pd.DataFrame(columns=['Data Vencimento','Descrição','Valor'])
+        # converte as datas uma única vez; a checagem de duplicidade usa a coluna já tipada
+        df_banco['Data Vencimento'] = converter_datas_br(df_banco['Data Vencimento'])
 
-        novos_lancamentos_sem_duplicatas = novos_lancamentos[~novos_temp['ID'].isin(df_banco_temp['ID'])].copy()
+        col_cmp = ['Data Vencimento','Descrição','Valor']
+        # recortes apenas lidos (sem .copy())
+        df_banco_temp = df_banco.dropna(subset=col_cmp)
+        novos_temp = novos_lancamentos.dropna(subset=col_cmp)
+
+        # descrições viram códigos inteiros de um mesmo conjunto de categorias,
+        # então a chave compara números curtos em vez do texto completo
+        # (os dois lados passam por astype(str) para as categorias terem o mesmo dtype)
+        descricoes = union_categoricals([
+            pd.Categorical(df_banco_temp['Descrição'].astype(str).str.strip().str.lower()),
+            pd.Categorical(df_extrato_debitos['HISTORICO_MINUSCULO'].reindex(novos_temp.index).astype(str)),
+        ])
+        codigos_banco = pd.Series(descricoes.codes[:len(df_banco_temp)], index=df_banco_temp.index)
+        codigos_novos = pd.Series(descricoes.codes[len(df_banco_temp):], index=novos_temp.index)
+
+        # valores comparados em centavos inteiros (evita diferenças de arredondamento do float)
+        centavos_banco = (pd.to_numeric(df_banco_temp['Valor'], errors='coerce') * 100).round().astype('Int64')
+        centavos_novos = (pd.to_numeric(novos_temp['Valor'], errors='coerce') * 100).round().astype('Int64')
+
+        # chave (data, descrição, valor) comparada por hash, sem montar textos
+        chaves_banco = pd.MultiIndex.from_arrays([
+            df_banco_temp['Data Vencimento'].dt.normalize(), codigos_banco, centavos_banco
+        ])
+        chaves_novos = pd.MultiIndex.from_arrays([
+            datas_novos_lancamentos.reindex(novos_temp.index).dt.normalize(), codigos_novos, centavos_novos
+        ])
+        eh_duplicata = pd.Series(chaves_novos.isin(chaves_banco), index=novos_temp.index)
+        eh_duplicata = eh_duplicata.reindex(novos_lancamentos.index, fill_value=False)
+
+        novos_lancamentos_sem_duplicatas = novos_lancamentos[~eh_duplicata]
         duplicatas_encontradas = len(novos_lancamentos) - len(novos_lancamentos_sem_duplicatas)
 
         if novos_lancamentos_sem_duplicatas.empty:
@@ -626,8 +753,7 @@ def processar_multiplos_extratos():
     root = tk.Tk()
     root.withdraw()
     
-    print("📁 Processamento em Lote - Múltiplos Extratos")
-    print("=" * 60)
+    print("📁 Processamento em Lote - Múltiplos Extratos\n" + "=" * 60)
 
     # Seleciona múltiplos arquivos de extrato
     caminhos_extratos = filedialog.askopenfilenames(
@@ -648,9 +774,8 @@ def processar_multiplos_extratos():
         print("❌ Operação cancelada. Nenhuma pasta de destino foi selecionada.")
         return False
     
-    print(f"📂 Pasta de destino: {pasta_destino}")
-    print(f"📄 {len(caminhos_extratos)} arquivo(s) selecionado(s) para processamento")
-    print()
+    print(f"📂 Pasta de destino: {pasta_destino}\n"
+          f"📄 {len(caminhos_extratos)} arquivo(s) selecionado(s) para processamento\n")
     
     # Cria janela de progresso
     janela_progresso = tk.Toplevel()
@@ -727,9 +852,8 @@ def processar_multiplos_extratos():
             else:
                 caminho_planilha_criada = caminho_planilha
                 # Copia template para o destino
-                caminho_template = obter_caminho_recurso('Automação_Gransoft.xlsx')
-                if os.path.exists(caminho_template):
-                    shutil.copy2(caminho_template, caminho_planilha_criada)
+                if template_disponivel():
+                    shutil.copy2(CAMINHO_TEMPLATE, caminho_planilha_criada)
                 else:
                     criar_planilha_basica(caminho_planilha_criada)
             
@@ -811,10 +935,10 @@ def processar_multiplos_extratos():
     tk.Button(frame_botoes, text="✅ Fechar", command=janela_progresso.destroy,
               bg='#2196F3', fg='white', font=('Arial', 10, 'bold')).pack(side=tk.RIGHT, padx=5)
     
-    print(f"\n📊 Processamento em lote concluído!")
-    print(f"✅ Sucessos: {sucessos}")
-    print(f"❌ Falhas: {falhas}")
-    print(f"📁 Planilhas salvas em: {pasta_destino}")
+    print(f"\n📊 Processamento em lote concluído!\n"
+          f"✅ Sucessos: {sucessos}\n"
+          f"❌ Falhas: {falhas}\n"
+          f"📁 Planilhas salvas em: {pasta_destino}")
     
     return True
 
@@ -823,15 +947,12 @@ def criar_nova_planilha_silenciosa(caminho_destino):
     Cria uma nova planilha silenciosamente (sem diálogos)
     """
     try:
-        # Obtém o caminho do template embutido
-        caminho_template = obter_caminho_recurso('Automação_Gransoft.xlsx')
-        
-        if not os.path.exists(caminho_template):
+        if not template_disponivel():
             # Se não encontrar o template embutido, cria um básico
             criar_planilha_basica(caminho_destino)
         else:
             # Copia o template para o local escolhido
-            shutil.copy2(caminho_template, caminho_destino)
+            shutil.copy2(CAMINHO_TEMPLATE, caminho_destino)
         
         return caminho_destino
         
@@ -848,6 +969,9 @@ def processar_extrato_novo_formato(caminho_extrato, caminho_planilha_usuario, mo
         if mostrar_detalhes:
             print(f"🔄 Processando extrato no novo formato: {os.path.basename(caminho_extrato)}")
 
+        # a aba 'Banco' (usada só na checagem de duplicidade) é lida em paralelo
+        leitura_banco = iniciar_leitura_banco(caminho_planilha_usuario)
+
         # 1. LEITURA ROBUSTA DO EXTRATO (pulando as 2 primeiras linhas)
         try:
             # A imagem mostra um arquivo Excel. Vamos priorizar a leitura de Excel.
@@ -910,26 +1034,25 @@ def processar_extrato_novo_formato(caminho_extrato, caminho_planilha_usuario, mo
 
         # 5. PREVENÇÃO DE DUPLICIDADE (comparando com a planilha de destino)
         try:
-            df_banco = pd.read_excel(caminho_planilha_usuario, sheet_name='Banco', engine='openpyxl')
+            df_banco = leitura_banco.result()
         except Exception:
             df_banco = pd.DataFrame(columns=novos_lancamentos.columns)
 
         col_cmp = ['Data Vencimento', 'Descrição', 'Valor']
-        df_banco_temp = df_banco.dropna(subset=col_cmp).copy()
-        novos_temp = novos_lancamentos.dropna(subset=col_cmp).copy()
+        # recortes apenas lidos (sem .copy()); IDs montados numa única concatenação
+        df_banco_temp = df_banco.dropna(subset=col_cmp)
+        novos_temp = novos_lancamentos.dropna(subset=col_cmp)
 
-        df_banco_temp['ID'] = (
-            df_banco_temp['Data Vencimento'].astype(str).str.strip() + '|' +
-            df_banco_temp['Descrição'].astype(str).str.strip().str.lower() + '|' +
+        ids_banco = df_banco_temp['Data Vencimento'].astype(str).str.strip().str.cat([
+            df_banco_temp['Descrição'].astype(str).str.strip().str.lower(),
             df_banco_temp['Valor'].astype(str)
-        )
-        novos_temp['ID'] = (
-            novos_temp['Data Vencimento'].astype(str).str.strip() + '|' +
-            novos_temp['Descrição'].astype(str).str.strip().str.lower() + '|' +
+        ], sep='|')
+        ids_novos = novos_temp['Data Vencimento'].astype(str).str.strip().str.cat([
+            novos_temp['Descrição'].astype(str).str.strip().str.lower(),
             novos_temp['Valor'].astype(str)
-        )
+        ], sep='|')
 
-        novos_lancamentos_sem_duplicatas = novos_lancamentos[~novos_temp['ID'].isin(df_banco_temp['ID'])].copy()
+        novos_lancamentos_sem_duplicatas = novos_lancamentos[~ids_novos.isin(ids_banco)]
         duplicatas_encontradas = len(novos_lancamentos) - len(novos_lancamentos_sem_duplicatas)
 
         if novos_lancamentos_sem_duplicatas.empty:
@@ -964,8 +1087,7 @@ def processar_extrato_unico():
     root = tk.Tk()
     root.withdraw()
 
-    print("📄 Processamento Individual - Extrato Único")
-    print("=" * 60)
+    print("📄 Processamento Individual - Extrato Único\n" + "=" * 60)
 
     # Passo 1: Criar nova planilha para o usuário
     print("📁 Primeiro, vamos criar sua planilha de controle...")
@@ -986,9 +1108,8 @@ def processar_extrato_unico():
         messagebox.showinfo("Cancelado", "Operação cancelada. Nenhum arquivo de extrato foi selecionado.")
         return False
 
-    print(f"✅ Planilha criada: {os.path.basename(caminho_planilha_usuario)}")
-    print(f"✅ Extrato selecionado: {os.path.basename(caminho_extrato)}")
-    print()
+    print(f"✅ Planilha criada: {os.path.basename(caminho_planilha_usuario)}\n"
+          f"✅ Extrato selecionado: {os.path.basename(caminho_extrato)}\n")
     print("🔄 Iniciando processamento...")
 
     # Processa o extrato
@@ -1034,8 +1155,7 @@ def chamar_processar_novo_formato():
     root = tk.Tk()
     root.withdraw()
 
-    print("📄 Processamento Individual - Novo Formato")
-    print("=" * 60)
+    print("📄 Processamento Individual - Novo Formato\n" + "=" * 60)
 
     # Passo 1: Criar nova planilha
     print("📁 Primeiro, vamos criar sua planilha de controle...")
@@ -1056,9 +1176,9 @@ def chamar_processar_novo_formato():
         messagebox.showinfo("Cancelado", "Operação cancelada. Nenhum arquivo de extrato foi selecionado.")
         return False
 
-    print(f"✅ Planilha criada: {os.path.basename(caminho_planilha_usuario)}")
-    print(f"✅ Extrato selecionado: {os.path.basename(caminho_extrato)}")
-    print("🔄 Iniciando processamento...")
+    print(f"✅ Planilha criada: {os.path.basename(caminho_planilha_usuario)}\n"
+          f"✅ Extrato selecionado: {os.path.basename(caminho_extrato)}\n"
+          "🔄 Iniciando processamento...")
 
     # Processa o extrato com a nova função
     resultado = processar_extrato_novo_formato(caminho_extrato, caminho_planilha_usuario, mostrar_detalhes=True)
@@ -1199,8 +1319,7 @@ def criar_menu_principal():
 
 def main():
     """Função principal do programa"""
-    print("🚀 Iniciando Automação Sicoob v2.1...")
-    print("=" * 60)
+    print("🚀 Iniciando Automação Sicoob v2.1...\n" + "=" * 60)
     
     # Verificar dependências
     if not verificar_dependencias():
@@ -1227,8 +1346,7 @@ def main():
         traceback.print_exc()
     
     finally:
-        print("\n" + "=" * 60)
-        print("👋 Obrigado por usar a Automação Sicoob!")
+        print("\n" + "=" * 60 + "\n👋 Obrigado por usar a Automação Sicoob!")
         # A linha abaixo pode ser removida se sys.exit() for usada
         # input("\nPressione ENTER para sair...")
 